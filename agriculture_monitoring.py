@@ -5,11 +5,18 @@ Contrôle de la vanne (ESP32/Heltec) via Firebase Realtime Database.
 """
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
+import numpy as np
+import orjson
 import requests
+import requests_cache
+import openmeteo_requests
+from openmeteo_requests import OpenMeteoRequestsError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime, timedelta
+import threading
 import time
 
 # Firebase : même base que l'Arduino (path /vanne/etat)
@@ -23,48 +30,92 @@ FIREBASE_CREDENTIALS_PATH = os.path.join(_DIR_APP, "firebase_credentials.json")
 if not os.path.isfile(FIREBASE_CREDENTIALS_PATH) and os.environ.get("GOOGLE_APPLICATION_CREDENTIALS"):
     FIREBASE_CREDENTIALS_PATH = os.environ["GOOGLE_APPLICATION_CREDENTIALS"]
 
-# Cache pour l'instance Firebase (éviter ré-init à chaque rerun)
-_firebase_app = None
+# Date du jour, calculée une seule fois par exécution du script
+_TODAY = datetime.now().date()
+
 _firebase_error = None  # Dernière erreur pour affichage diagnostic
+# Durée pendant laquelle l'état lu de la vanne est réutilisé entre reruns
+VANNE_CACHE_TTL_S = 3.0
+
+
+@st.cache_resource(show_spinner=False)
+def _init_firebase_app():
+    """Initialise l'app Firebase une seule fois par processus. Lève une exception en cas d'échec (non mise en cache)."""
+    if not os.path.isfile(FIREBASE_CREDENTIALS_PATH):
+        raise FileNotFoundError(f"Fichier introuvable : {FIREBASE_CREDENTIALS_PATH}")
+    import firebase_admin
+    from firebase_admin import credentials
+    # Si déjà initialisé (ex: cache vidé), récupérer l'app existante
+    if firebase_admin._apps:
+        return firebase_admin.get_app()
+    cred = credentials.Certificate(FIREBASE_CREDENTIALS_PATH)
+    return firebase_admin.initialize_app(cred, {"databaseURL": FIREBASE_DATABASE_URL})
 
 
 def get_firebase_app():
     """Initialise et retourne l'app Firebase si les credentials sont présents."""
-    global _firebase_app, _firebase_error
-    if _firebase_app is not None:
-        return _firebase_app
+    global _firebase_error
     _firebase_error = None
-    if not os.path.isfile(FIREBASE_CREDENTIALS_PATH):
-        _firebase_error = f"Fichier introuvable : {FIREBASE_CREDENTIALS_PATH}"
-        return None
     try:
-        import firebase_admin
-        from firebase_admin import credentials
-        # Si déjà initialisé (ex: re-run Streamlit), récupérer l'app existante
-        if firebase_admin._apps:
-            _firebase_app = firebase_admin.get_app()
-            return _firebase_app
-        cred = credentials.Certificate(FIREBASE_CREDENTIALS_PATH)
-        _firebase_app = firebase_admin.initialize_app(cred, {"databaseURL": FIREBASE_DATABASE_URL})
-        return _firebase_app
+        return _init_firebase_app()
     except Exception as e:
         _firebase_error = str(e)
         return None
 
 
-def firebase_get_vanne_etat():
-    """Lit l'état actuel de la vanne depuis Firebase (/vanne/etat). Retourne None si indisponible."""
+def _firebase_access_token(app):
+    """Jeton OAuth2 du compte de service de l'app, rafraîchi uniquement lorsqu'il a expiré."""
+    # Les credentials google-auth sont conservés dans l'app (cache_resource) : le jeton est réutilisé
+    google_cred = app.credential.get_credential()
+    if not google_cred.valid:
+        from google.auth.transport.requests import Request
+        google_cred.refresh(Request())
+    return google_cred.token
+
+
+def firebase_get_vanne_etat(app=None, session=None):
+    """
+    Lit l'état actuel de la vanne depuis Firebase (/vanne/etat). Retourne None si indisponible.
+    
+    Lecture via l'API REST de Realtime Database sur la session HTTP partagée (connexion
+    réutilisée, sans passer par le client firebase_admin).
+    `app` et `session` : app Firebase et session HTTP déjà obtenues, à fournir pour un appel
+    depuis un thread de travail (les caches Streamlit ne sont utilisables que dans le thread du script).
+    """
     try:
-        app = get_firebase_app()
+        if app is None:
+            app = get_firebase_app()
         if app is None:
             return None
-        from firebase_admin import db
-        ref = db.reference("/vanne/etat")
-        return ref.get()
+        if session is None:
+            session = get_http_session()
+        response = session.get(
+            f"{FIREBASE_DATABASE_URL}/vanne/etat.json",
+            # Jeton dans l'en-tête plutôt que dans l'URL (pas de fuite dans les logs ni le cache)
+            headers={"Authorization": f"Bearer {_firebase_access_token(app)}"},
+            timeout=3
+        )
+        response.raise_for_status()
+        return orjson.loads(response.content)
     except Exception:
         return None
 
 
+def vanne_cache_is_fresh():
+    """Indique si la dernière lecture de la vanne date de moins de VANNE_CACHE_TTL_S."""
+    cached = st.session_state.get("vanne_cache")
+    return cached is not None and time.monotonic() - cached[1] <= VANNE_CACHE_TTL_S
+
+
+def firebase_get_vanne_etat_cached():
+    """Comme firebase_get_vanne_etat, mais réutilise la dernière lecture si elle date de moins de VANNE_CACHE_TTL_S."""
+    if vanne_cache_is_fresh():
+        return st.session_state.vanne_cache[0]
+    etat = firebase_get_vanne_etat()
+    st.session_state.vanne_cache = (etat, time.monotonic())
+    return etat
+
+
 def firebase_set_vanne_etat(etat: bool) -> bool:
     """Écrit l'état de la vanne dans Firebase (/vanne/etat). Retourne True si succès."""
     try:
@@ -93,6 +144,191 @@ st.markdown("### Monitoring de l'humidité de l'air et du sol en temps réel")
 # FONCTIONS UTILITAIRES (définies en premier)
 # ============================================================================
 
+# Cache HTTP persistant (SQLite). Open-Meteo a sa propre base pour que le bouton
+# « Actualiser » puisse la vider entièrement sans parcourir les réponses Nominatim.
+HTTP_CACHE_PATH = os.path.join(_DIR_APP, ".cache", "http_cache")
+OPEN_METEO_CACHE_PATH = os.path.join(_DIR_APP, ".cache", "open_meteo_cache")
+# Durée de validité par hôte (en secondes) ; les autres hôtes (Firebase) ne sont pas mis en cache
+HTTP_CACHE_EXPIRE_AFTER = {
+    "nominatim.openstreetmap.org": 86400
+}
+OPEN_METEO_CACHE_EXPIRE_AFTER = 600
+
+
+def _build_http_session(cache_path, expire_after, urls_expire_after=None):
+    """
+    Construit une session HTTP (keep-alive + pool de connexions) avec cache disque.
+    
+    Les erreurs transitoires (429, 5xx) sont retentées avec un backoff exponentiel.
+    Les réponses sont conservées sur disque (SQLite) pour survivre aux redémarrages,
+    et resservies si l'API est en panne (stale_if_error).
+    """
+    session = requests_cache.CachedSession(
+        cache_path,
+        backend="sqlite",
+        expire_after=expire_after,
+        urls_expire_after=urls_expire_after,
+        allowable_methods=("GET",),
+        stale_if_error=True
+    )
+    session.headers.update({"User-Agent": "Agriculture-Monitoring-App"})  # Requis par Nominatim
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 502, 503, 504],
+        raise_on_status=False  # Laisse raise_for_status() produire l'HTTPError habituelle
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_resource
+def get_http_session():
+    """
+    Session HTTP partagée pour Nominatim et les lectures REST de Firebase.
+    
+    Mise en cache via st.cache_resource : une variable globale serait recréée à chaque rerun.
+    Seuls les hôtes listés dans HTTP_CACHE_EXPIRE_AFTER sont mis en cache.
+    """
+    return _build_http_session(
+        HTTP_CACHE_PATH,
+        requests_cache.DO_NOT_CACHE,
+        urls_expire_after=HTTP_CACHE_EXPIRE_AFTER
+    )
+
+
+@st.cache_resource
+def get_open_meteo_session():
+    """Session HTTP partagée pour Open-Meteo, avec son propre cache disque (10 minutes)."""
+    return _build_http_session(OPEN_METEO_CACHE_PATH, OPEN_METEO_CACHE_EXPIRE_AFTER)
+
+
+# Politique d'usage Nominatim : 1 requête/s maximum
+NOMINATIM_MIN_INTERVAL_S = 1.1
+# Nombre de recherches de suggestions conservées par session pour la réutilisation par préfixe
+NOMINATIM_PREFIX_CACHE_SIZE = 64
+# Au-delà de PLOT_DOWNSAMPLE_THRESHOLD points, les courbes sont réduites à PLOT_MAX_POINTS (LTTB)
+PLOT_DOWNSAMPLE_THRESHOLD = 1000
+PLOT_MAX_POINTS = 500
+
+# Mise en page statique du graphique d'évolution (seules les courbes varient)
+# Note : Dans les nouvelles versions de Plotly, titlefont est remplacé par title.font
+_FIG_LAYOUT = dict(
+    title="Évolution de l'humidité de l'air et du sol",
+    xaxis=dict(title=dict(text="Date et Heure")),
+    yaxis=dict(
+        title=dict(text="Humidité de l'Air (%)", font=dict(color="#1f77b4")),
+        tickfont=dict(color="#1f77b4"),
+        side="left"
+    ),
+    yaxis2=dict(
+        title=dict(text="Humidité du Sol (m³/m³)", font=dict(color="#ff7f0e")),
+        tickfont=dict(color="#ff7f0e"),
+        overlaying="y",
+        side="right"
+    ),
+    hovermode="x unified",
+    height=500,
+    legend=dict(
+        yanchor="top",
+        y=0.99,
+        xanchor="left",
+        x=0.01
+    ),
+    template="plotly_white",
+    uirevision="static"  # Conserve zoom/légende entre les reruns
+)
+
+
+@st.cache_resource
+def _nominatim_rate_limiter():
+    """État partagé entre reruns et sessions pour espacer les appels à Nominatim."""
+    return {"lock": threading.Lock(), "last_call": 0.0}
+
+
+def _normalize_query(query):
+    """Normalise une recherche (espaces, casse) pour maximiser les hits de cache."""
+    return " ".join(query.split()).lower()
+
+
+def _is_fresh_in_http_cache(session, url, params):
+    """Indique si le cache HTTP contient une réponse non expirée pour cette requête GET."""
+    request = requests.Request("GET", url, params=params).prepare()
+    cached = session.cache.get_response(session.cache.create_key(request))
+    return cached is not None and not cached.is_expired
+
+
+@st.cache_data(ttl=86400, max_entries=1024, show_spinner=False)
+def _nominatim_search(query, limit):
+    """
+    Appel à l'API Nominatim, mis en cache 24 h par (requête normalisée, limite).
+    
+    Les exceptions ne sont pas mises en cache. Les appels réels sont espacés d'au
+    moins NOMINATIM_MIN_INTERVAL_S secondes.
+    """
+    url = "https://nominatim.openstreetmap.org/search"
+    params = {
+        "q": query,
+        "format": "json",
+        "limit": limit,
+        "addressdetails": 1
+    }
+    
+    session = get_http_session()
+    if _is_fresh_in_http_cache(session, url, params):
+        # Réponse servie par le cache disque : pas d'appel réseau, donc pas d'espacement
+        response = session.get(url, params=params, timeout=10)
+    else:
+        limiter = _nominatim_rate_limiter()
+        with limiter["lock"]:
+            wait = NOMINATIM_MIN_INTERVAL_S - (time.monotonic() - limiter["last_call"])
+            if wait > 0:
+                time.sleep(wait)
+            response = None
+            try:
+                response = session.get(url, params=params, timeout=10)
+            finally:
+                # Seuls les appels réellement envoyés comptent pour l'espacement
+                if not getattr(response, "from_cache", False):
+                    limiter["last_call"] = time.monotonic()
+    response.raise_for_status()
+    
+    # Décodage orjson directement depuis les octets (plus rapide que json de la stdlib)
+    return orjson.loads(response.content)
+
+
+def _suggestions_from_prefix_cache(norm_query, limit):
+    """
+    Réutilise localement les suggestions d'une recherche voisine de la session
+    (même requête, préfixe ou extension de celle-ci) sans appeler Nominatim.
+    
+    Retourne None si aucune recherche en cache ne fournit au moins `limit`
+    suggestions contenant la requête.
+    """
+    if not norm_query:
+        return None
+    cache = st.session_state.get("nomi_cache", {})
+    if norm_query in cache:
+        return cache[norm_query]
+    for cached_query, suggestions in cache.items():
+        if not cached_query:
+            continue
+        if norm_query.startswith(cached_query) or cached_query.startswith(norm_query):
+            matches = [sug for sug in suggestions if norm_query in sug["display_name"].lower()]
+            if len(matches) >= limit:
+                return matches[:limit]
+    return None
+
+
+def _remember_suggestions(norm_query, suggestions):
+    """Ajoute des suggestions au cache de session (les plus anciennes sont évincées)."""
+    cache = st.session_state.setdefault("nomi_cache", {})
+    cache[norm_query] = suggestions
+    while len(cache) > NOMINATIM_PREFIX_CACHE_SIZE:
+        del cache[next(iter(cache))]
+
+
 def search_address_suggestions(query, limit=10):
     """
     Recherche des suggestions d'adresses pour l'autocomplétion.
@@ -108,22 +344,17 @@ def search_address_suggestions(query, limit=10):
     if not query or len(query) < 2:
         return []
     
+    # La longueur minimale s'applique aussi après normalisation (ex. "  " donne "")
+    norm_query = _normalize_query(query)
+    if len(norm_query) < 2:
+        return []
+    
+    cached = _suggestions_from_prefix_cache(norm_query, limit)
+    if cached is not None:
+        return cached
+    
     try:
-        url = "https://nominatim.openstreetmap.org/search"
-        params = {
-            "q": query,
-            "format": "json",
-            "limit": limit,
-            "addressdetails": 1
-        }
-        headers = {
-            "User-Agent": "Agriculture-Monitoring-App"  # Requis par Nominatim
-        }
-        
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
+        data = _nominatim_search(norm_query, limit)
         
         suggestions = []
         if data and len(data) > 0:
@@ -134,6 +365,7 @@ def search_address_suggestions(query, limit=10):
                     "lon": float(result["lon"])
                 })
         
+        _remember_suggestions(norm_query, suggestions)
         return suggestions
             
     except requests.exceptions.Timeout:
@@ -158,21 +390,7 @@ def geocode_address(address):
     - dict avec 'lat', 'lon', et 'display_name' ou None en cas d'erreur
     """
     try:
-        url = "https://nominatim.openstreetmap.org/search"
-        params = {
-            "q": address,
-            "format": "json",
-            "limit": 1,
-            "addressdetails": 1
-        }
-        headers = {
-            "User-Agent": "Agriculture-Monitoring-App"  # Requis par Nominatim
-        }
-        
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
+        data = _nominatim_search(_normalize_query(address), 1)
         
         if data and len(data) > 0:
             result = data[0]
@@ -185,16 +403,16 @@ def geocode_address(address):
             return None
             
     except requests.exceptions.Timeout:
-        st.sidebar.error("⏱️ Timeout lors de la recherche d'adresse")
+        st.error("⏱️ Timeout lors de la recherche d'adresse")
         return None
     except requests.exceptions.RequestException as e:
-        st.sidebar.error(f"❌ Erreur de connexion : {str(e)}")
+        st.error(f"❌ Erreur de connexion : {str(e)}")
         return None
     except (KeyError, ValueError) as e:
-        st.sidebar.error(f"❌ Format de réponse inattendu")
+        st.error(f"❌ Format de réponse inattendu")
         return None
     except Exception as e:
-        st.sidebar.error(f"❌ Erreur inattendue : {str(e)}")
+        st.error(f"❌ Erreur inattendue : {str(e)}")
         return None
 
 # ============================================================================
@@ -221,7 +439,14 @@ search_method = st.sidebar.radio(
     help="Choisissez de rechercher par adresse ou directement par coordonnées"
 )
 
-if search_method == "Adresse / Zone":
+@st.fragment
+def address_picker():
+    """
+    Recherche par adresse avec autocomplétion (à appeler dans `with st.sidebar:`).
+    
+    Exécutée comme fragment : la saisie ne relance que ce bloc. Un changement de
+    coordonnées relance l'application entière pour mettre à jour la carte et les données.
+    """
     # Initialisation de la session state pour les suggestions
     if "address_query" not in st.session_state:
         st.session_state.address_query = ""
@@ -231,7 +456,7 @@ if search_method == "Adresse / Zone":
         st.session_state.selected_address_index = None
     
     # Champ de recherche avec autocomplétion
-    address_input = st.sidebar.text_input(
+    address_input = st.text_input(
         "Entrez une adresse ou un lieu",
         value=st.session_state.address_query,
         placeholder="Ex: Paris, France ou 123 Rue de la Ferme, Orléans",
@@ -241,7 +466,8 @@ if search_method == "Adresse / Zone":
     
     # Recherche de suggestions en temps réel (si au moins 2 caractères)
     if address_input and len(address_input) >= 2:
-        # Recherche des suggestions (avec un petit délai pour éviter trop de requêtes)
+        # Recherche des suggestions (les appels réseau sont mis en cache et espacés
+        # par _nominatim_search, voir NOMINATIM_MIN_INTERVAL_S)
         if address_input != st.session_state.address_query:
             with st.spinner("🔍 Recherche de suggestions..."):
                 suggestions = search_address_suggestions(address_input, limit=10)
@@ -257,7 +483,7 @@ if search_method == "Adresse / Zone":
                              for idx, sug in enumerate(st.session_state.address_suggestions)]
         suggestion_options.insert(0, "Sélectionnez une adresse dans la liste...")
         
-        selected_suggestion = st.sidebar.selectbox(
+        selected_suggestion = st.selectbox(
             "Suggestions d'adresses",
             options=suggestion_options,
             index=0,
@@ -272,27 +498,43 @@ if search_method == "Adresse / Zone":
                 if 0 <= selected_index < len(st.session_state.address_suggestions):
                     selected_address = st.session_state.address_suggestions[selected_index]
                     
-                    # Mise à jour automatique des coordonnées
-                    st.session_state.latitude = selected_address["lat"]
-                    st.session_state.longitude = selected_address["lon"]
-                    st.sidebar.success(f"✅ Localisation sélectionnée : {selected_address['display_name'][:60]}...")
+                    # Mise à jour des coordonnées uniquement au changement de sélection
+                    # (sinon chaque rerun écraserait le résultat d'une recherche manuelle)
+                    selection = (selected_address["display_name"], selected_address["lat"], selected_address["lon"])
+                    if st.session_state.get("applied_suggestion") != selection:
+                        st.session_state.applied_suggestion = selection
+                        st.session_state.latitude = selected_address["lat"]
+                        st.session_state.longitude = selected_address["lon"]
+                        st.rerun()
+                    st.success(f"✅ Localisation sélectionnée : {selected_address['display_name'][:60]}...")
             except (ValueError, IndexError):
                 pass
     
     # Bouton de recherche manuelle (si l'utilisateur veut forcer la recherche)
-    if st.sidebar.button("🔍 Rechercher cette adresse", type="primary"):
+    if st.button("🔍 Rechercher cette adresse", type="primary"):
         if address_input:
             with st.spinner("Recherche de la localisation..."):
                 coords = geocode_address(address_input)
-                if coords:
-                    st.session_state.latitude = coords["lat"]
-                    st.session_state.longitude = coords["lon"]
-                    st.sidebar.success(f"✅ Localisation trouvée : {coords.get('display_name', '')[:50]}...")
-                else:
-                    st.sidebar.error("❌ Adresse non trouvée. Vérifiez l'orthographe.")
+            if coords:
+                st.session_state.latitude = coords["lat"]
+                st.session_state.longitude = coords["lon"]
+                # Message conservé pour l'afficher après le rerun complet
+                st.session_state.address_notice = f"✅ Localisation trouvée : {coords.get('display_name', '')[:50]}..."
+                st.rerun()
+            else:
+                st.error("❌ Adresse non trouvée. Vérifiez l'orthographe.")
+    
+    notice = st.session_state.pop("address_notice", None)
+    if notice:
+        st.success(notice)
     
     # Affichage des coordonnées trouvées
-    st.sidebar.caption(f"📍 Coordonnées actuelles : {st.session_state.latitude:.4f}°N, {st.session_state.longitude:.4f}°E")
+    st.caption(f"📍 Coordonnées actuelles : {st.session_state.latitude:.4f}°N, {st.session_state.longitude:.4f}°E")
+
+
+if search_method == "Adresse / Zone":
+    with st.sidebar:
+        address_picker()
     latitude = st.session_state.latitude
     longitude = st.session_state.longitude
 else:
@@ -325,17 +567,34 @@ else:
 
 # Sélecteur de dates pour l'historique
 st.sidebar.subheader("📅 Période d'historique")
+# Valeurs par défaut posées via la session : les widgets conservent ensuite leur état via leur clé.
+# Si la page reste ouverte après minuit et que l'utilisateur n'a pas modifié la période,
+# les valeurs par défaut sont recalées sur le nouveau jour (sinon la fenêtre resterait figée).
+_seeded_on = st.session_state.get("dates_seeded_on")
+if _seeded_on != _TODAY and (
+    _seeded_on is None
+    or (st.session_state.get("date_end") == _seeded_on
+        and st.session_state.get("date_start") == _seeded_on - timedelta(days=7))
+):
+    st.session_state.date_end = _TODAY
+    st.session_state.date_start = _TODAY - timedelta(days=7)
+    st.session_state.dates_seeded_on = _TODAY
 date_end = st.sidebar.date_input(
     "Date de fin",
-    value=datetime.now().date(),
-    max_value=datetime.now().date()
+    max_value=_TODAY,
+    key="date_end"
 )
 
+# Ramène la date de début sous la date de fin avant de créer le widget
+# (une valeur au-delà de max_value lèverait une exception)
+if st.session_state.date_start >= date_end:
+    st.session_state.date_start = date_end - timedelta(days=1)
+
 date_start = st.sidebar.date_input(
     "Date de début",
-    value=(datetime.now() - timedelta(days=7)).date(),
     max_value=date_end,
-    help="Par défaut : 7 derniers jours"
+    help="Par défaut : 7 derniers jours",
+    key="date_start"
 )
 
 # Validation : date de début doit être antérieure à date de fin
@@ -347,12 +606,69 @@ if date_start >= date_end:
 # FONCTIONS UTILITAIRES (suite)
 # ============================================================================
 
+@st.cache_data(ttl=600, show_spinner=False)
+def _request_open_meteo(lat, lon, start_date, end_date):
+    """
+    Appel HTTP à l'API Open-Meteo, mis en cache 10 minutes par (lat, lon, dates).
+    
+    Les exceptions ne sont pas mises en cache : une erreur réseau est retentée au rerun suivant.
+    """
+    # Détermination de l'endpoint selon la période
+    # L'endpoint "forecast" fonctionne pour les données récentes (jusqu'à ~7 jours)
+    # Pour des données plus anciennes, utiliser "archive" (si disponible)
+    
+    # Utilisation de l'endpoint forecast (fonctionne pour données récentes)
+    url = "https://api.open-meteo.com/v1/forecast"
+    
+    # Paramètres de l'API
+    params = {
+        "latitude": lat,
+        "longitude": lon,
+        "hourly": "relative_humidity_2m,soil_moisture_0_to_1cm",
+        # Pour changer la profondeur du sol, modifier le paramètre ci-dessus :
+        # Exemple pour 3-9cm : "hourly": "relative_humidity_2m,soil_moisture_3_to_9cm"
+        # Exemple pour 9-27cm : "hourly": "relative_humidity_2m,soil_moisture_9_to_27cm"
+        "start_date": start_date.strftime("%Y-%m-%d"),
+        "end_date": end_date.strftime("%Y-%m-%d"),
+        "timezone": "Europe/Paris"
+    }
+    
+    # Appel API au format FlatBuffers (client officiel) : valeurs reçues directement en
+    # tableaux numpy float32, sans décodage JSON
+    client = openmeteo_requests.Client(session=get_open_meteo_session())
+    try:
+        responses = client.weather_api(url, params=params, timeout=10)
+    except OpenMeteoRequestsError as e:
+        # Le client encapsule les erreurs réseau : on remonte l'exception requests d'origine
+        if isinstance(e.__cause__, requests.exceptions.RequestException):
+            raise e.__cause__
+        raise
+    
+    response = responses[0]
+    hourly = response.Hourly()
+    if hourly is None or hourly.VariablesLength() < 2:
+        return {}
+    
+    # Horodatages en heure locale (timezone demandée), comme le champ "time" du format JSON
+    times = np.arange(hourly.Time(), hourly.TimeEnd(), hourly.Interval(), dtype=np.int64)
+    times += response.UtcOffsetSeconds()
+    
+    # Les variables sont renvoyées dans l'ordre du paramètre "hourly"
+    return {
+        "hourly": {
+            "time": times.astype("datetime64[s]"),
+            "relative_humidity_2m": hourly.Variables(0).ValuesAsNumpy(),
+            "soil_moisture_0_to_1cm": hourly.Variables(1).ValuesAsNumpy()
+        }
+    }
+
+
 def fetch_open_meteo_data(lat, lon, start_date, end_date):
     """
     Récupère les données météorologiques depuis l'API Open-Meteo.
     
     Paramètres:
-    - lat, lon : coordonnées géographiques
+    - lat, lon : coordonnées géographiques (arrondies à 4 décimales pour le cache)
     - start_date, end_date : dates de début et fin (format date)
     
     Retourne:
@@ -366,33 +682,8 @@ def fetch_open_meteo_data(lat, lon, start_date, end_date):
     - Voir documentation : https://open-meteo.com/en/docs
     """
     try:
-        # Détermination de l'endpoint selon la période
-        # L'endpoint "forecast" fonctionne pour les données récentes (jusqu'à ~7 jours)
-        # Pour des données plus anciennes, utiliser "archive" (si disponible)
-        today = datetime.now().date()
-        days_diff = (today - start_date).days
-        
-        # Utilisation de l'endpoint forecast (fonctionne pour données récentes)
-        url = "https://api.open-meteo.com/v1/forecast"
-        
-        # Paramètres de l'API
-        params = {
-            "latitude": lat,
-            "longitude": lon,
-            "hourly": "relative_humidity_2m,soil_moisture_0_to_1cm",
-            # Pour changer la profondeur du sol, modifier le paramètre ci-dessus :
-            # Exemple pour 3-9cm : "hourly": "relative_humidity_2m,soil_moisture_3_to_9cm"
-            # Exemple pour 9-27cm : "hourly": "relative_humidity_2m,soil_moisture_9_to_27cm"
-            "start_date": start_date.strftime("%Y-%m-%d"),
-            "end_date": end_date.strftime("%Y-%m-%d"),
-            "timezone": "Europe/Paris"
-        }
-        
-        # Appel API avec timeout
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()  # Lève une exception si erreur HTTP
-        
-        data = response.json()
+        # Arrondi (~10 m) pour que de petites variations de saisie réutilisent le cache
+        data = _request_open_meteo(round(lat, 4), round(lon, 4), start_date, end_date)
         
         # Vérification de la structure des données
         if "hourly" not in data:
@@ -401,7 +692,7 @@ def fetch_open_meteo_data(lat, lon, start_date, end_date):
         
         # Vérification que les données contiennent bien les paramètres demandés
         hourly = data.get("hourly", {})
-        if not hourly.get("relative_humidity_2m") or not hourly.get("soil_moisture_0_to_1cm"):
+        if len(hourly.get("relative_humidity_2m", [])) == 0 or len(hourly.get("soil_moisture_0_to_1cm", [])) == 0:
             st.warning("⚠️ Certains paramètres ne sont pas disponibles pour cette localisation")
             return None
             
@@ -410,6 +701,10 @@ def fetch_open_meteo_data(lat, lon, start_date, end_date):
     except requests.exceptions.Timeout:
         st.error("⏱️ Timeout : L'API Open-Meteo ne répond pas. Veuillez réessayer.")
         return None
+    except OpenMeteoRequestsError as e:
+        # Erreur renvoyée par l'API (coordonnées ou dates invalides, quota dépassé)
+        st.error(f"❌ Requête invalide. Vérifiez les coordonnées et les dates. ({str(e)})")
+        return None
     except requests.exceptions.HTTPError as e:
         if e.response.status_code == 400:
             st.error("❌ Requête invalide. Vérifiez les coordonnées et les dates.")
@@ -432,6 +727,8 @@ def process_meteo_data(api_data):
     - DataFrame avec colonnes : datetime, humidity_air, humidity_soil
     - None en cas d'erreur
     """
+    import pandas as pd  # Import différé : module lourd, inutile si l'API a échoué
+    
     try:
         if api_data is None:
             return None
@@ -442,16 +739,17 @@ def process_meteo_data(api_data):
         humidity_soil = hourly_data.get("soil_moisture_0_to_1cm", [])
         
         # Vérification que les données existent
-        if not times or not humidity_air or not humidity_soil:
+        if len(times) == 0 or len(humidity_air) == 0 or len(humidity_soil) == 0:
             st.warning("⚠️ Données incomplètes reçues de l'API")
             return None
         
-        # Création du DataFrame
+        # Création du DataFrame à partir de tableaux typés (évite l'inférence de types de pandas)
+        # float32 : précision suffisante pour ces mesures, mémoire divisée par deux
         df = pd.DataFrame({
-            "datetime": pd.to_datetime(times),
-            "humidity_air": humidity_air,
-            "humidity_soil": humidity_soil
-        })
+            "datetime": np.asarray(times, dtype="datetime64[ns]"),
+            "humidity_air": np.asarray(humidity_air, dtype=np.float32),
+            "humidity_soil": np.asarray(humidity_soil, dtype=np.float32)
+        }, copy=False)
         
         # Suppression des valeurs nulles
         df = df.dropna()
@@ -467,56 +765,238 @@ def process_meteo_data(api_data):
         return None
 
 
+class MeteoDataUnavailable(Exception):
+    """Données Open-Meteo indisponibles (le message d'erreur a déjà été affiché)."""
+
+
+@st.cache_resource(ttl=600, max_entries=32, show_spinner=False)
+def _load_meteo_dataframe(lat, lon, start_date, end_date):
+    """
+    DataFrame météo pour (lat, lon, dates), mis en cache sans sérialisation : le même
+    objet est renvoyé à chaque lecture. Il est partagé entre reruns et sessions et ne
+    doit donc jamais être modifié en place.
+    
+    Lève MeteoDataUnavailable en cas d'échec pour que l'échec ne soit pas mis en cache.
+    """
+    df = process_meteo_data(fetch_open_meteo_data(lat, lon, start_date, end_date))
+    if df is None:
+        raise MeteoDataUnavailable()
+    return df
+
+
+def get_meteo_dataframe(lat, lon, start_date, end_date):
+    """
+    Retourne le DataFrame (datetime, humidity_air, humidity_soil) de la période, en lecture seule.
+    
+    Retourne None si les données n'ont pas pu être chargées.
+    """
+    try:
+        return _load_meteo_dataframe(round(lat, 4), round(lon, 4), start_date, end_date)
+    except MeteoDataUnavailable:
+        return None
+
+
+@st.cache_data(ttl=600, max_entries=32, show_spinner=False)
+def df_to_csv_bytes(df):
+    """Sérialise le DataFrame en CSV (UTF-8), une seule fois par jeu de données."""
+    return df.to_csv(index=False).encode("utf-8")
+
+
+@st.cache_data(ttl=600, max_entries=32, show_spinner=False)
+def compute_period_stats(df):
+    """
+    Moyenne, minimum, maximum et écart-type des deux humidités, en une passe NumPy.
+    
+    Retourne:
+    - dict {"mean", "min", "max", "std"} de tableaux [humidity_air, humidity_soil]
+    """
+    # Accumulation en float64 pour ne pas perdre de précision sur les colonnes float32
+    vals = df[["humidity_air", "humidity_soil"]].to_numpy(dtype=np.float64)
+    return {
+        "mean": vals.mean(axis=0),
+        "min": vals.min(axis=0),
+        "max": vals.max(axis=0),
+        "std": vals.std(axis=0, ddof=1)
+    }
+
+
+@st.cache_resource(show_spinner=False)
+def build_location_deck(lat, lon):
+    """
+    Carte pydeck avec un point rouge sur le champ, construite une fois par position
+    (coordonnées arrondies à 4 décimales par l'appelant) et réutilisée entre reruns.
+    """
+    # Imports différés : seulement au premier rendu de la carte pour une position
+    import pandas as pd
+    import pydeck as pdk
+    
+    layer = pdk.Layer(
+        "ScatterplotLayer",
+        data=pd.DataFrame({"lat": [lat], "lon": [lon]}),
+        get_position="[lon, lat]",
+        get_radius=500,
+        get_fill_color=[255, 0, 0]
+    )
+    view_state = pdk.ViewState(latitude=lat, longitude=lon, zoom=10)
+    # map_style=None : fond de carte suivant le thème de l'app, comme st.map
+    return pdk.Deck(layers=[layer], initial_view_state=view_state, map_style=None)
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Sous-échantillonnage Largest-Triangle-Three-Buckets : indices des n_out points
+    qui préservent au mieux la forme visuelle de la courbe (x croissant).
+    
+    Retourne tous les indices si la série contient déjà n_out points ou moins.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    
+    # Le premier et le dernier point sont toujours conservés ; les autres sont
+    # répartis en n_out - 2 buckets de taille égale
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Point de référence : moyenne du bucket suivant (ou dernier point)
+        if i < n_out - 3:
+            avg_x = x[end:edges[i + 2]].mean()
+            avg_y = y[end:edges[i + 2]].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        # Point du bucket formant le plus grand triangle avec le point retenu précédent
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        indices[i + 1] = a
+    
+    return indices
+
+
+@st.cache_data(ttl=600, max_entries=32, show_spinner=False)
+def build_humidity_figure(df):
+    """
+    Construit le graphique Plotly des deux humidités, une seule fois par jeu de données.
+    
+    Seules les courbes dépendent des données : la mise en page vient de _FIG_LAYOUT.
+    """
+    import plotly.graph_objects as go  # Import différé : uniquement si des données sont à tracer
+    
+    # Sous-échantillonnage LTTB des longues séries (les données complètes restent
+    # disponibles dans le tableau et l'export CSV)
+    air_df = soil_df = df
+    if len(df) > PLOT_DOWNSAMPLE_THRESHOLD:
+        x_ns = df["datetime"].to_numpy().astype(np.int64)
+        air_df = df.iloc[lttb_indices(x_ns, df["humidity_air"].to_numpy(), PLOT_MAX_POINTS)]
+        soil_df = df.iloc[lttb_indices(x_ns, df["humidity_soil"].to_numpy(), PLOT_MAX_POINTS)]
+    
+    # Création du graphique avec Plotly (deux courbes sur le même graphique)
+    fig = go.Figure(layout=_FIG_LAYOUT)
+    
+    # Courbe pour l'humidité de l'air
+    fig.add_trace(go.Scatter(
+        x=air_df["datetime"],
+        y=air_df["humidity_air"],
+        mode="lines",
+        name="Humidité de l'Air (%)",
+        line=dict(color="#1f77b4", width=2),
+        hovertemplate="<b>%{fullData.name}</b><br>" +
+                      "Date: %{x}<br>" +
+                      "Valeur: %{y:.1f}%<extra></extra>"
+    ))
+    
+    # Courbe pour l'humidité du sol
+    # Utilisation d'un axe Y secondaire pour mieux visualiser les deux métriques
+    fig.add_trace(go.Scatter(
+        x=soil_df["datetime"],
+        y=soil_df["humidity_soil"],
+        mode="lines",
+        name="Humidité du Sol (m³/m³)",
+        line=dict(color="#ff7f0e", width=2),
+        yaxis="y2",
+        hovertemplate="<b>%{fullData.name}</b><br>" +
+                      "Date: %{x}<br>" +
+                      "Valeur: %{y:.3f} m³/m³<extra></extra>"
+    ))
+    
+    return fig
+
+
 # ============================================================================
 # RÉCUPÉRATION DES DONNÉES
 # ============================================================================
 
-# Bouton pour actualiser les données
+# Bouton pour actualiser les données (vide les caches Open-Meteo avant de relancer)
 if st.sidebar.button("🔄 Actualiser les données", type="primary"):
+    _load_meteo_dataframe.clear()
+    _request_open_meteo.clear()
+    get_open_meteo_session().cache.clear()
     st.rerun()
 
-# Affichage d'un spinner pendant le chargement
-with st.spinner("🔄 Chargement des données depuis Open-Meteo..."):
-    api_data = fetch_open_meteo_data(latitude, longitude, date_start, date_end)
-    df = process_meteo_data(api_data)
+# La lecture de la vanne dans Firebase (si la valeur en cache a expiré) est lancée en
+# parallèle du chargement Open-Meteo : les deux appels réseau sont indépendants
+firebase_app = get_firebase_app()
+with ThreadPoolExecutor(max_workers=1) as executor:
+    vanne_future = None
+    if firebase_app is not None and not vanne_cache_is_fresh():
+        vanne_future = executor.submit(firebase_get_vanne_etat, firebase_app, get_http_session())
+    
+    # Affichage d'un spinner pendant le chargement
+    with st.spinner("🔄 Chargement des données depuis Open-Meteo..."):
+        df = get_meteo_dataframe(latitude, longitude, date_start, date_end)
+    
+    if vanne_future is not None:
+        st.session_state.vanne_cache = (vanne_future.result(), time.monotonic())
 
 # ============================================================================
 # CONTRÔLE VANNE (Firebase / ESP32)
 # ============================================================================
-st.subheader("🚰 Contrôle de la vanne (ESP32 / Heltec)")
-st.caption("Commande envoyée à Firebase Realtime Database (path : /vanne/etat). Votre Arduino lit cette valeur et pilote la LED/vanne.")
-
-firebase_ok = get_firebase_app() is not None
-if not firebase_ok:
-    err_msg = _firebase_error or "Fichier firebase_credentials.json introuvable."
-    st.warning(
-        "⚠️ **Firebase non configuré** — Pour piloter la vanne depuis le site, ajoutez le fichier de compte de service Firebase : "
-        "téléchargez-le depuis la console Firebase (Paramètres du projet → Comptes de service → Générer une nouvelle clé privée) "
-        "et enregistrez-le sous le nom `firebase_credentials.json` dans le dossier de l'application."
-    )
-    st.error(f"**Détail :** {err_msg}")
-else:
-    # Lecture de l'état actuel depuis Firebase (même path que l'Arduino : /vanne/etat)
-    etat_actuel = firebase_get_vanne_etat()
-    if etat_actuel is None:
-        etat_actuel = False  # défaut : éteint
-    if "vanne_etat" not in st.session_state:
+@st.fragment
+def vanne_control():
+    """Panneau de contrôle de la vanne. Exécuté comme fragment : un clic sur le toggle ne relance que ce bloc."""
+    st.subheader("🚰 Contrôle de la vanne (ESP32 / Heltec)")
+    st.caption("Commande envoyée à Firebase Realtime Database (path : /vanne/etat). Votre Arduino lit cette valeur et pilote la LED/vanne.")
+
+    firebase_ok = get_firebase_app() is not None
+    if not firebase_ok:
+        err_msg = _firebase_error or "Fichier firebase_credentials.json introuvable."
+        st.warning(
+            "⚠️ **Firebase non configuré** — Pour piloter la vanne depuis le site, ajoutez le fichier de compte de service Firebase : "
+            "téléchargez-le depuis la console Firebase (Paramètres du projet → Comptes de service → Générer une nouvelle clé privée) "
+            "et enregistrez-le sous le nom `firebase_credentials.json` dans le dossier de l'application."
+        )
+        st.error(f"**Détail :** {err_msg}")
+    else:
+        # Lecture de l'état actuel depuis Firebase (même path que l'Arduino : /vanne/etat)
+        etat_actuel = firebase_get_vanne_etat_cached()
+        if etat_actuel is None:
+            etat_actuel = False  # défaut : éteint
+        if "vanne_etat" not in st.session_state:
+            st.session_state.vanne_etat = etat_actuel
+        # Synchroniser l'affichage avec Firebase à chaque chargement
         st.session_state.vanne_etat = etat_actuel
-    # Synchroniser l'affichage avec Firebase à chaque chargement
-    st.session_state.vanne_etat = etat_actuel
-
-    col_vanne1, col_vanne2 = st.columns([1, 2])
-    with col_vanne1:
-        nouveau_etat = st.toggle("Vanne **ON** / OFF", value=st.session_state.vanne_etat, key="vanne_toggle")
-    with col_vanne2:
-        if nouveau_etat != etat_actuel:
-            if firebase_set_vanne_etat(nouveau_etat):
-                st.session_state.vanne_etat = nouveau_etat
-                st.success("État envoyé à Firebase : **" + ("ON" if nouveau_etat else "OFF") + "** — l'ESP32 va mettre à jour la vanne/LED.")
+
+        col_vanne1, col_vanne2 = st.columns([1, 2])
+        with col_vanne1:
+            nouveau_etat = st.toggle("Vanne **ON** / OFF", value=st.session_state.vanne_etat, key="vanne_toggle")
+        with col_vanne2:
+            if nouveau_etat != etat_actuel:
+                if firebase_set_vanne_etat(nouveau_etat):
+                    st.session_state.vanne_etat = nouveau_etat
+                    st.session_state.vanne_cache = (nouveau_etat, time.monotonic())
+                    st.success("État envoyé à Firebase : **" + ("ON" if nouveau_etat else "OFF") + "** — l'ESP32 va mettre à jour la vanne/LED.")
+                else:
+                    st.error("Impossible d'écrire dans Firebase.")
             else:
-                st.error("Impossible d'écrire dans Firebase.")
-        else:
-            st.info("État actuel : **" + ("ON" if etat_actuel else "OFF") + "** (synchronisé avec l'ESP32)")
+                st.info("État actuel : **" + ("ON" if etat_actuel else "OFF") + "** (synchronisé avec l'ESP32)")
+
+
+vanne_control()
 
 st.markdown("---")
 
@@ -528,14 +1008,8 @@ if df is not None and not df.empty:
     # --- CARTE ---
     st.subheader("📍 Localisation du champ")
     
-    # Création d'un DataFrame pour la carte (st.map nécessite lat/lon)
-    map_data = pd.DataFrame({
-        "lat": [latitude],
-        "lon": [longitude]
-    })
-    
     # Affichage de la carte avec un point rouge
-    st.map(map_data, zoom=10)
+    st.pydeck_chart(build_location_deck(round(latitude, 4), round(longitude, 4)))
     st.caption(f"Coordonnées : {latitude:.4f}°N, {longitude:.4f}°E")
     
     # --- KPIs (Indicateurs actuels) ---
@@ -574,103 +1048,50 @@ if df is not None and not df.empty:
     # --- GRAPHIQUES D'HISTORIQUE ---
     st.subheader("📈 Évolution temporelle")
     
-    # Création du graphique avec Plotly (deux courbes sur le même graphique)
-    fig = go.Figure()
-    
-    # Courbe pour l'humidité de l'air
-    fig.add_trace(go.Scatter(
-        x=df["datetime"],
-        y=df["humidity_air"],
-        mode="lines",
-        name="Humidité de l'Air (%)",
-        line=dict(color="#1f77b4", width=2),
-        hovertemplate="<b>%{fullData.name}</b><br>" +
-                      "Date: %{x}<br>" +
-                      "Valeur: %{y:.1f}%<extra></extra>"
-    ))
-    
-    # Courbe pour l'humidité du sol
-    # Utilisation d'un axe Y secondaire pour mieux visualiser les deux métriques
-    fig.add_trace(go.Scatter(
-        x=df["datetime"],
-        y=df["humidity_soil"],
-        mode="lines",
-        name="Humidité du Sol (m³/m³)",
-        line=dict(color="#ff7f0e", width=2),
-        yaxis="y2",
-        hovertemplate="<b>%{fullData.name}</b><br>" +
-                      "Date: %{x}<br>" +
-                      "Valeur: %{y:.3f} m³/m³<extra></extra>"
-    ))
-    
-    # Configuration du layout
-    # Note : Dans les nouvelles versions de Plotly, titlefont est remplacé par title.font
-    fig.update_layout(
-        title="Évolution de l'humidité de l'air et du sol",
-        xaxis_title="Date et Heure",
-        yaxis=dict(
-            title=dict(text="Humidité de l'Air (%)", font=dict(color="#1f77b4")),
-            tickfont=dict(color="#1f77b4"),
-            side="left"
-        ),
-        yaxis2=dict(
-            title=dict(text="Humidité du Sol (m³/m³)", font=dict(color="#ff7f0e")),
-            tickfont=dict(color="#ff7f0e"),
-            overlaying="y",
-            side="right"
-        ),
-        hovermode="x unified",
-        height=500,
-        legend=dict(
-            yanchor="top",
-            y=0.99,
-            xanchor="left",
-            x=0.01
-        ),
-        template="plotly_white"
-    )
-    
-    st.plotly_chart(fig, use_container_width=True)
+    fig = build_humidity_figure(df)
+    st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
     
     # --- TABLEAU DE DONNÉES (optionnel) ---
     with st.expander("📋 Voir les données brutes"):
+        # Formatage appliqué côté navigateur (pas de Styler pandas rendu en HTML à chaque rerun) ;
+        # les colonnes restent numériques et donc triables
         st.dataframe(
-            df.style.format({
-                "humidity_air": "{:.1f}%",
-                "humidity_soil": "{:.3f} m³/m³"
-            }),
-            use_container_width=True
+            df,
+            use_container_width=True,
+            column_config={
+                "humidity_air": st.column_config.NumberColumn(format="%.1f%%"),
+                "humidity_soil": st.column_config.NumberColumn(format="%.3f m³/m³")
+            }
         )
         
         # Bouton de téléchargement
-        csv = df.to_csv(index=False)
+        csv = df_to_csv_bytes(df)
         st.download_button(
             label="💾 Télécharger les données (CSV)",
             data=csv,
-            file_name=f"donnees_agricoles_{datetime.now().strftime('%Y%m%d')}.csv",
+            file_name=f"donnees_agricoles_{_TODAY.strftime('%Y%m%d')}.csv",
             mime="text/csv"
         )
     
     # --- STATISTIQUES RÉSUMÉES ---
     st.subheader("📊 Statistiques sur la période")
     
+    stats = compute_period_stats(df)
     col1, col2 = st.columns(2)
     
     with col1:
         st.markdown("**Humidité de l'Air**")
-        stats_air = df["humidity_air"].describe()
-        st.write(f"- **Moyenne** : {stats_air['mean']:.1f}%")
-        st.write(f"- **Minimum** : {stats_air['min']:.1f}%")
-        st.write(f"- **Maximum** : {stats_air['max']:.1f}%")
-        st.write(f"- **Écart-type** : {stats_air['std']:.1f}%")
+        st.write(f"- **Moyenne** : {stats['mean'][0]:.1f}%")
+        st.write(f"- **Minimum** : {stats['min'][0]:.1f}%")
+        st.write(f"- **Maximum** : {stats['max'][0]:.1f}%")
+        st.write(f"- **Écart-type** : {stats['std'][0]:.1f}%")
     
     with col2:
         st.markdown("**Humidité du Sol**")
-        stats_soil = df["humidity_soil"].describe()
-        st.write(f"- **Moyenne** : {stats_soil['mean']:.3f} m³/m³")
-        st.write(f"- **Minimum** : {stats_soil['min']:.3f} m³/m³")
-        st.write(f"- **Maximum** : {stats_soil['max']:.3f} m³/m³")
-        st.write(f"- **Écart-type** : {stats_soil['std']:.3f} m³/m³")
+        st.write(f"- **Moyenne** : {stats['mean'][1]:.3f} m³/m³")
+        st.write(f"- **Minimum** : {stats['min'][1]:.3f} m³/m³")
+        st.write(f"- **Maximum** : {stats['max'][1]:.3f} m³/m³")
+        st.write(f"- **Écart-type** : {stats['std'][1]:.3f} m³/m³")
     
 else:
     # Message d'erreur si pas de données
@@ -684,11 +1105,7 @@ else:
     
     # Afficher quand même la carte avec les coordonnées
     st.subheader("📍 Localisation du champ")
-    map_data = pd.DataFrame({
-        "lat": [latitude],
-        "lon": [longitude]
-    })
-    st.map(map_data, zoom=10)
+    st.pydeck_chart(build_location_deck(round(latitude, 4), round(longitude, 4)))
 
 # ============================================================================
 # FOOTER / INFORMATIONS